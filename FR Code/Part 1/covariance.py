@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+协方差矩阵估计: 样本协方差、EWMA 与 Ledoit-Wolf 收缩
+
+输入为 (日期 × 资产) 的收益率矩阵，可为 numpy 数组或 DataFrame，缺失值记为 NaN。
+样本协方差按成对掩码只使用两资产同时有数据的日期；EWMA 每日做秩一更新，
+分解结果 (Cholesky / 特征分解) 按日期缓存，供组合VaR和相关性模拟重复使用。
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _as_array(returns):
+    # 统一转为浮点数组，并保留 DataFrame 的列名以便还原
+    if isinstance(returns, pd.DataFrame):
+        return returns.to_numpy(dtype=float), returns.columns
+    return np.asarray(returns, dtype=float), None
+
+
+def _wrap(matrix, columns):
+    if columns is None:
+        return matrix
+    return pd.DataFrame(matrix, index=columns, columns=columns)
+
+
+def sample_covariance(returns, min_periods=2):
+    """
+    成对掩码的样本协方差 (ddof=1)，与 DataFrame.cov() 结果一致，
+    但全部通过矩阵乘法完成，不对资产对做循环。共同样本数少于 min_periods 的元素为 NaN。
+    """
+    X, columns = _as_array(returns)
+    mask = ~np.isnan(X)
+    M = mask.astype(float)
+    X0 = np.where(mask, X, 0.0)
+
+    # n_ij: 共同观测数；s_ij: 资产 i 在资产 j 有数据的日期上的收益之和
+    n = M.T @ M
+    s = X0.T @ M
+    cross = X0.T @ X0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (cross - s * s.T / n) / (n - 1)
+    cov[n < max(min_periods, 2)] = np.nan
+    return _wrap(cov, columns)
+
+
+def ewma_covariance(returns, lam=0.94):
+    # RiskMetrics EWMA 协方差: Sigma_t = lam * Sigma_{t-1} + (1 - lam) * r_t r_t^T
+    X, columns = _as_array(returns)
+    model = EWMACovariance(X.shape[1], lam=lam)
+    for row in X:
+        model.update(row)
+    return _wrap(model.cov, columns)
+
+
+def ledoit_wolf(returns):
+    """
+    Ledoit-Wolf (2004) 向缩放单位阵收缩的协方差估计，返回 (协方差矩阵, 收缩强度)。
+    缺失值在去均值后按 0 处理。计算量为 O(T N^2)，不需要构造 T 个 N×N 的外积。
+    """
+    X, columns = _as_array(returns)
+    T, N = X.shape
+    X = X - np.nanmean(X, axis=0)
+    X = np.where(np.isnan(X), 0.0, X)
+
+    S = X.T @ X / T
+    mu = np.trace(S) / N
+    delta2 = (np.sum(S ** 2) - 2 * mu * np.trace(S) + mu ** 2 * N) / N
+    # sum_t ||x_t x_t^T - S||_F^2 = sum_t ||x_t||^4 - T ||S||_F^2
+    beta2 = (np.sum(np.sum(X ** 2, axis=1) ** 2) / T - np.sum(S ** 2)) / (T * N)
+    shrinkage = 0.0 if delta2 == 0 else min(beta2, delta2) / delta2
+
+    cov = (1 - shrinkage) * S
+    cov[np.diag_indices(N)] += shrinkage * mu
+    return _wrap(cov, columns), shrinkage
+
+
+def cov_to_corr(cov):
+    # 协方差矩阵转换为相关系数矩阵
+    values = np.asarray(cov, dtype=float)
+    std = np.sqrt(np.diag(values))
+    corr = values / np.outer(std, std)
+    if isinstance(cov, pd.DataFrame):
+        return pd.DataFrame(corr, index=cov.index, columns=cov.columns)
+    return corr
+
+
+def cholesky_rank_one_update(L, x):
+    """
+    已知 A = L L^T，返回 A + x x^T 的下三角 Cholesky 因子，复杂度 O(N^2)。
+    外层对列循环，每列内部为向量化运算。
+    """
+    L = L.copy()
+    x = np.array(x, dtype=float)
+    for k in range(L.shape[0]):
+        r = np.hypot(L[k, k], x[k])
+        c = r / L[k, k]
+        s = x[k] / L[k, k]
+        L[k, k] = r
+        L[k + 1:, k] = (L[k + 1:, k] + s * x[k + 1:]) / c
+        x[k + 1:] = c * x[k + 1:] - s * L[k + 1:, k]
+    return L
+
+
+class FactorizationCache:
+    """
+    按日期缓存协方差矩阵及其 Cholesky 因子和特征分解，分解在首次使用时计算。
+    最多保留 max_entries 个日期 (最近最少使用者先淘汰)。
+    """
+
+    def __init__(self, max_entries=5):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def put(self, date, cov, cholesky=None):
+        self._entries[date] = {'cov': cov, 'cholesky': cholesky, 'eigh': None}
+        self._entries.move_to_end(date)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get(self, date):
+        if date not in self._entries:
+            raise KeyError(f"缓存中没有日期 {date} 的协方差矩阵")
+        self._entries.move_to_end(date)
+        return self._entries[date]
+
+    def __contains__(self, date):
+        return date in self._entries
+
+    def cov(self, date):
+        return self._get(date)['cov']
+
+    def cholesky(self, date):
+        entry = self._get(date)
+        if entry['cholesky'] is None:
+            try:
+                entry['cholesky'] = np.linalg.cholesky(entry['cov'])
+            except np.linalg.LinAlgError:
+                # 成对掩码得到的矩阵可能非正定，将负特征值截断后重新分解
+                values, vectors = self.eigh(date)
+                repaired = (vectors * np.maximum(values, 1e-12)) @ vectors.T
+                entry['cholesky'] = np.linalg.cholesky(repaired)
+        return entry['cholesky']
+
+    def cached_cholesky(self, date):
+        # 只返回已经算好的因子，不触发分解；日期不在缓存或尚未分解时返回 None
+        entry = self._entries.get(date)
+        return None if entry is None else entry['cholesky']
+
+    def eigh(self, date):
+        entry = self._get(date)
+        if entry['eigh'] is None:
+            entry['eigh'] = np.linalg.eigh(entry['cov'])
+        return entry['eigh']
+
+
+class EWMACovariance:
+    """
+    逐日更新的 EWMA 协方差。
+
+    每个新交易日只做一次秩一更新 (O(N^2))，而不是用全部历史重新计算。
+    当日缺失的资产对保持前一日的值；当日数据完整且上一日的 Cholesky 因子已经算好时，
+    新日期的因子由秩一更新直接得到，无需重新分解。出现缺失值的日期不是秩一更新，
+    增量路径由此中断: 之后的因子在首次调用 cholesky() 时对当日矩阵重新分解，
+    再从该日期起恢复增量更新 (不会为了更新而回头分解前一日的矩阵)。
+    """
+
+    def __init__(self, n_assets, lam=0.94, initial_cov=None, max_cached=5):
+        self.lam = lam
+        self.cov = np.zeros((n_assets, n_assets)) if initial_cov is None else np.array(initial_cov, dtype=float)
+        self.cache = FactorizationCache(max_entries=max_cached)
+        self.date = None
+
+    def update(self, returns, date=None):
+        r = np.asarray(returns, dtype=float)
+        mask = ~np.isnan(r)
+        r0 = np.where(mask, r, 0.0)
+        previous_date = self.date
+
+        updated = self.lam * self.cov + (1 - self.lam) * np.outer(r0, r0)
+        if mask.all():
+            self.cov = updated
+        else:
+            pair_mask = np.outer(mask, mask)
+            self.cov = np.where(pair_mask, updated, self.cov)
+
+        self.date = date
+        if date is not None:
+            cholesky = None
+            L_prev = self.cache.cached_cholesky(previous_date) if mask.all() else None
+            if L_prev is not None:
+                # sqrt(lam) L 为 lam * Sigma 的因子，再叠加 (1 - lam) r r^T
+                cholesky = cholesky_rank_one_update(np.sqrt(self.lam) * L_prev, np.sqrt(1 - self.lam) * r0)
+            self.cache.put(date, self.cov, cholesky=cholesky)
+        return self.cov
+
+    def cholesky(self, date=None):
+        return self.cache.cholesky(self.date if date is None else date)
+
+    def eigh(self, date=None):
+        return self.cache.eigh(self.date if date is None else date)
+
+
+if __name__ == "__main__":
+    from price_data import load_panel
+
+    prices = load_panel({
+        'AAPL': 'AAPL_data.csv',
+        'SPY': 'SPY_data.csv',
+        'S&P 500': 'S&P_500（B）_data.csv',
+        'US Debt': 'US_national_debt _data.csv',
+    })
+    returns = np.log(prices / prices.shift(1)).iloc[1:]
+
+    print("样本协方差 (成对掩码):")
+    print(sample_covariance(returns))
+
+    print("\nEWMA 协方差 (lambda = 0.94):")
+    print(ewma_covariance(returns))
+
+    lw_cov, shrinkage = ledoit_wolf(returns)
+    print(f"\nLedoit-Wolf 收缩强度: {shrinkage:.4f}")
+    print(cov_to_corr(lw_cov))
+
+    # 逐日更新并读取缓存的 Cholesky 因子
+    model = EWMACovariance(returns.shape[1], initial_cov=sample_covariance(returns.iloc[:60]).values)
+    for date, row in returns.iloc[60:].iterrows():
+        model.update(row.values, date=date)
+    L = model.cholesky()
+    print(f"\n最新日期 {model.date.date()} 的 Cholesky 重构误差: {np.abs(L @ L.T - model.cov).max():.2e}")
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+动态多因子 (APT) 载荷的批量估计
+
+1.6 对 2010-2024 全样本做一次静态回归；这里对所有资产同时给出随时间变化的因子载荷:
+    rolling_loadings    滚动窗口 OLS
+    expanding_loadings  扩展窗口 OLS
+    kalman_loadings     随机游走 beta 的卡尔曼滤波
+滚动/扩展窗口不逐窗口重新回归，而是维护累积的 X'X 与 X'y (加入新行、减去移出窗口的行)，
+再对所有日期批量求解正规方程。每个资产的 X'X 只累加该资产有收益观测的日期，
+累积数组约为 日期数 × asset_chunk × 因子数^2，可通过 asset_chunk 控制内存。
+因子在内部按全样本均值和标准差标准化以避免累积和的数值误差，输出前换算回原始单位。
+
+输出为 (日期 × 资产 × 因子) 数组，最后一维顺序为 ['const'] + 因子列名 (add_constant=True 时)。
+收益率中的缺失值只从该资产的回归中剔除，窗口内有效观测少于 min_periods 时结果为 NaN；因子矩阵不允许缺失。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _prepare(returns, factors, add_constant=True):
+    Y = returns.to_numpy(dtype=float) if isinstance(returns, pd.DataFrame) else np.asarray(returns, dtype=float)
+    X = factors.to_numpy(dtype=float) if isinstance(factors, pd.DataFrame) else np.asarray(factors, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    if X.ndim == 1:
+        X = X[:, None]
+    if X.shape[0] != Y.shape[0]:
+        raise ValueError("收益率与因子的日期数不一致")
+    if np.isnan(X).any():
+        raise ValueError("因子矩阵中存在缺失值")
+
+    # 标准化因子并加入常数项；不含常数项时因子只缩放、不去均值
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    if not add_constant:
+        return Y, X / scale, np.zeros(X.shape[1]), scale
+    mean = X.mean(axis=0)
+    Z = np.column_stack([np.ones(X.shape[0]), (X - mean) / scale])
+    return Y, Z, mean, scale
+
+
+def _to_original_units(B, mean, scale, add_constant):
+    # 标准化因子上的系数换算回原始因子单位
+    if not add_constant:
+        return B / scale
+    slopes = B[..., 1:] / scale
+    intercept = B[..., :1] - (slopes * mean).sum(axis=-1, keepdims=True)
+    return np.concatenate([intercept, slopes], axis=-1)
+
+
+def _solve_batch(XX, XY):
+    # 批量求解 XX @ B = XY (前导维度为窗口与资产)，出现奇异窗口时改用伪逆
+    try:
+        return np.linalg.solve(XX, XY)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(XX) @ XY
+
+
+def _window_loadings(returns, factors, window, min_periods, add_constant, asset_chunk, dtype):
+    Y, Z, mean, scale = _prepare(returns, factors, add_constant)
+    T, N = Y.shape
+    K = Z.shape[1]
+
+    # 累积交叉乘积: 窗口 (s, t] 上的 X'X 为 C[t] - C[s]
+    ZZ = Z[:, :, None] * Z[:, None, :]
+    ends = np.arange(1, T + 1)
+    starts = np.zeros(T, dtype=int) if window is None else np.maximum(ends - window, 0)
+    ready = (ends - starts) >= min_periods
+    ends, starts = ends[ready], starts[ready]
+
+    out = np.full((T, N, K), np.nan, dtype=dtype)
+    chunk = N if asset_chunk is None else asset_chunk
+    for lo in range(0, N, chunk):
+        hi = min(lo + chunk, N)
+        Yc = Y[:, lo:hi]
+        valid = ~np.isnan(Yc)
+        Yc = np.where(valid, Yc, 0.0)
+
+        # 每个资产的 X'X 只累加有收益观测的日期: Z⊗Z 乘以该资产的有效掩码
+        XX_cum = np.concatenate([np.zeros((1, hi - lo, K, K)),
+                                 np.cumsum(ZZ[:, None] * valid[:, :, None, None], axis=0)])
+        XY_cum = np.concatenate([np.zeros((1, hi - lo, K)), np.cumsum(Yc[:, :, None] * Z[:, None, :], axis=0)])
+        count_cum = np.concatenate([np.zeros((1, hi - lo)), np.cumsum(valid, axis=0)])
+        XX = XX_cum[ends] - XX_cum[starts]
+        XY = XY_cum[ends] - XY_cum[starts]
+
+        # 有效观测不足 min_periods 的窗口记为 NaN，求解前以单位阵占位避免奇异
+        enough = (count_cum[ends] - count_cum[starts]) >= min_periods
+        XX[~enough] = np.eye(K)
+        B = _solve_batch(XX, XY[..., None])[..., 0]
+        B[~enough] = np.nan
+        out[ready, lo:hi] = B
+
+    return _to_original_units(out, mean, scale, add_constant).astype(dtype, copy=False)
+
+
+def rolling_loadings(returns, factors, window=252, min_periods=None, add_constant=True, asset_chunk=100,
+                     dtype=np.float64):
+    # 长度为 window 的滚动窗口OLS载荷，窗口内有效收益少于 min_periods (默认 window) 的日期为 NaN
+    min_periods = window if min_periods is None else min_periods
+    return _window_loadings(returns, factors, window, min_periods, add_constant, asset_chunk, dtype)
+
+
+def expanding_loadings(returns, factors, min_periods=252, add_constant=True, asset_chunk=100, dtype=np.float64):
+    # 从样本起点到当前日期的扩展窗口OLS载荷，有效收益少于 min_periods 的日期为 NaN
+    return _window_loadings(returns, factors, None, min_periods, add_constant, asset_chunk, dtype)
+
+
+def kalman_loadings(returns, factors, delta=1e-4, initial_var=1e3, add_constant=True, dtype=np.float64):
+    """
+    状态方程 beta_t = beta_{t-1} + eta_t，观测方程 y_t = x_t' beta_t + eps_t。
+    状态噪声方差取观测噪声方差的 delta 倍，此时卡尔曼增益与观测噪声大小无关，
+    所有资产共享同一个 (K × K) 状态协方差和增益，每个日期只需一次向量化的状态更新。
+    缺失收益的日期该资产的状态不更新，但共享的状态协方差仍按有观测处理，缺失较少时影响可以忽略。
+    """
+    Y, Z, mean, scale = _prepare(returns, factors, add_constant)
+    T, N = Y.shape
+    K = Z.shape[1]
+
+    beta = np.zeros((K, N))
+    P = np.eye(K) * initial_var
+    out = np.empty((T, N, K), dtype=dtype)
+    for t in range(T):
+        x = Z[t]
+        P = P + delta * np.eye(K)
+        Px = P @ x
+        gain = Px / (x @ Px + 1.0)
+        y = Y[t]
+        observed = ~np.isnan(y)
+        innovation = np.where(observed, y - x @ beta, 0.0)
+        beta += np.outer(gain, innovation)
+        P = P - np.outer(gain, Px)
+        out[t] = beta.T
+    return _to_original_units(out, mean, scale, add_constant).astype(dtype, copy=False)
+
+
+if __name__ == "__main__":
+    from price_data import load_panel
+
+    # 股票日收益率
+    prices = load_panel({'MSFT': '1.6_MSFT_data.csv', 'AAPL': '1.6_AAPL_data.csv', 'GOOGL': '1.6_GOOGL_data.csv'})
+    returns = prices.pct_change().iloc[1:]
+
+    # 宏观因子按发布日期向前填充到每个交易日 (1.6 只保留与发布日期重合的交易日)
+    macro = None
+    for file_path in ['1.6_risk_free_rate.csv', '1.6_unemployment_rate.csv', '1.6_inflation_rate.csv', '1.6_gdp_data.csv']:
+        df = pd.read_csv(file_path, parse_dates=['DATE'], index_col='DATE')
+        macro = df if macro is None else macro.join(df, how='outer')
+    factors = macro.reindex(macro.index.union(returns.index)).ffill().reindex(returns.index)
+    valid = factors.notna().all(axis=1)
+    returns, factors = returns[valid], factors[valid]
+
+    # 超额收益 (与1.6相同，以 GS10 / 100 作为无风险收益)
+    excess = returns.sub(factors['GS10'] / 100, axis=0)
+    names = ['const'] + list(factors.columns)
+
+    rolling = rolling_loadings(excess, factors, window=252)
+    expanding = expanding_loadings(excess, factors, min_periods=252)
+    kalman = kalman_loadings(excess, factors)
+    print(f"载荷数组形状 (日期 × 资产 × 因子): {rolling.shape}")
+
+    last = pd.DataFrame(rolling[-1], index=excess.columns, columns=names)
+    print(f"\n{excess.index[-1].date()} 的252日滚动载荷:")
+    print(last)
+    print("\n扩展窗口载荷:")
+    print(pd.DataFrame(expanding[-1], index=excess.columns, columns=names))
+    print("\n卡尔曼滤波载荷:")
+    print(pd.DataFrame(kalman[-1], index=excess.columns, columns=names))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+回撤、Sortino 与尾部风险指标
+
+对整个 (日期 × 资产) 的日收益率矩阵一次性计算全部指标，各指标均为按列的
+向量化/掩码归约，不对资产做 pandas 逐列循环。缺失收益记为 NaN，不参与统计，
+计算净值时视为当日收益为 0。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _as_array(returns):
+    if isinstance(returns, pd.DataFrame):
+        return returns.to_numpy(dtype=float), returns.columns
+    returns = np.asarray(returns, dtype=float)
+    if returns.ndim == 1:
+        returns = returns[:, None]
+    return returns, pd.RangeIndex(returns.shape[1])
+
+
+def drawdowns(returns):
+    # 净值、历史最高点和回撤序列，形状均与收益率矩阵相同
+    R, _ = _as_array(returns)
+    wealth = np.cumprod(1 + np.nan_to_num(R), axis=0)
+    peak = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=0)
+    return wealth, peak, wealth / peak - 1
+
+
+def _longest_run(flags):
+    # 每列最长连续 True 的长度: 用上一次为 False 的位置计算当前连续长度
+    idx = np.arange(flags.shape[0])[:, None]
+    last_reset = np.maximum.accumulate(np.where(flags, -1, idx), axis=0)
+    return (idx - last_reset).max(axis=0)
+
+
+def compute_metrics(returns, benchmark=None, risk_free_rate=0.02, periods_per_year=252,
+                    confidence_level=0.95, omega_threshold=0.0):
+    """
+    返回以资产为索引的指标表:
+    年化收益/波动、Sharpe、Sortino、最大回撤、最长回撤期 (期数)、Calmar、Omega、
+    尾部比率 (95分位 / 5分位绝对值)、历史 VaR 与 CVaR，
+    给定基准 (与收益率同长度的一维序列) 时另加上行/下行捕获率。
+    """
+    R, columns = _as_array(returns)
+    valid = ~np.isnan(R)
+    n_obs = valid.sum(axis=0)
+    rf = risk_free_rate / periods_per_year
+
+    mean = np.nanmean(R, axis=0)
+    std = np.nanstd(R, axis=0, ddof=1)
+    ann_return = mean * periods_per_year
+    ann_vol = std * np.sqrt(periods_per_year)
+
+    # 下行偏差只统计低于无风险收益的部分
+    shortfall = np.where(valid, np.minimum(R - rf, 0.0), 0.0)
+    downside_dev = np.sqrt((shortfall ** 2).sum(axis=0) / n_obs) * np.sqrt(periods_per_year)
+
+    wealth, _, dd = drawdowns(R)
+    max_drawdown = dd.min(axis=0)
+    cagr = wealth[-1] ** (periods_per_year / n_obs) - 1
+
+    excess = np.where(valid, R - omega_threshold, 0.0)
+    gains = np.maximum(excess, 0.0).sum(axis=0)
+    losses = np.maximum(-excess, 0.0).sum(axis=0)
+
+    alpha = 1 - confidence_level
+    q_low, q_high = np.nanquantile(R, [alpha, confidence_level], axis=0)
+    tail = valid & (R <= q_low)
+    cvar = -np.where(tail, R, 0.0).sum(axis=0) / tail.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            'Annual Return': ann_return,
+            'Annual Volatility': ann_vol,
+            'Sharpe': (ann_return - risk_free_rate) / ann_vol,
+            'Sortino': (ann_return - risk_free_rate) / downside_dev,
+            'Max Drawdown': max_drawdown,
+            'Max Drawdown Duration': _longest_run(dd < 0),
+            'Calmar': cagr / np.abs(max_drawdown),
+            'Omega': gains / losses,
+            'Tail Ratio': np.abs(q_high) / np.abs(q_low),
+            'VaR': -q_low,
+            'CVaR': cvar,
+        }
+
+        if benchmark is not None:
+            b = np.asarray(benchmark, dtype=float).reshape(-1, 1)
+            for name, side in [('Upside Capture', b > 0), ('Downside Capture', b < 0)]:
+                mask = valid & side
+                asset_mean = np.where(mask, R, 0.0).sum(axis=0) / mask.sum(axis=0)
+                bench_mean = np.where(mask, b, 0.0).sum(axis=0) / mask.sum(axis=0)
+                metrics[name] = asset_mean / bench_mean
+
+    return pd.DataFrame(metrics, index=columns)
+
+
+if __name__ == "__main__":
+    from price_data import load_panel
+
+    prices = load_panel({'AAPL': 'AAPL_data.csv', 'SPY': 'SPY_data.csv', 'S&P 500': 'S&P_500（B）_data.csv'})
+    returns = prices.pct_change().iloc[1:]
+
+    metrics = compute_metrics(returns, benchmark=returns['SPY'])
+    print(metrics.T.round(4))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+读取 yfinance 导出的价格CSV (前三行为 Price/Ticker/Date 表头)
+"""
+
+import pandas as pd
+
+PRICE_COLUMNS = ["Close", "High", "Low", "Open", "Volume"]
+
+
+def load_price_csv(file_path):
+    # 跳过三行表头，返回以日期为索引、列为 Close/High/Low/Open/Volume 的数值型 DataFrame
+    data = pd.read_csv(file_path, skiprows=3, names=["Date"] + PRICE_COLUMNS)
+    data['Date'] = pd.to_datetime(data['Date'])
+    data.set_index('Date', inplace=True)
+    return data.apply(pd.to_numeric, errors='coerce').sort_index()
+
+
+def load_panel(file_paths, column='Close'):
+    # 多个资产的同一列按日期外连接，缺失日期保留为 NaN
+    return pd.DataFrame({name: load_price_csv(path)[column] for name, path in file_paths.items()})
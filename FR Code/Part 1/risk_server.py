@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+常驻内存的组合风险查询服务
+
+启动时读取价格CSV，并把收益率矩阵、均值、相对基准的 beta、协方差矩阵及其 Cholesky
+分解、蒙特卡洛情景保存在内存中。之后对任意权重向量的 Sharpe / Treynor / VaR / 成分VaR 查询
+只需若干次向量运算。数据文件修改时间变化时自动重新加载。
+
+HTTP 接口 (asyncio 处理连接，计算在线程池中执行):
+    GET  /health           服务状态与数据版本
+    GET  /assets           资产列表
+    POST /risk             请求体 {"weights": {"AAPL": 0.6, "SPY": 0.4}, "confidence_level": 0.99}
+
+运行: python risk_server.py，然后
+    curl -X POST localhost:8765/risk -d '{"weights": {"AAPL": 0.6, "SPY": 0.4}}'
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.stats import norm
+
+from covariance import FactorizationCache, sample_covariance
+from price_data import load_panel
+
+DEFAULT_FILES = {
+    'AAPL': 'AAPL_data.csv',
+    'SPY': 'SPY_data.csv',
+    'S&P 500': 'S&P_500（B）_data.csv',
+    'US Debt': 'US_national_debt _data.csv',
+}
+
+
+class RiskSnapshot:
+    """
+    某一数据版本下预先计算好的全部中间量，创建后只读，可被多个线程同时使用。
+    """
+
+    def __init__(self, file_paths, benchmark, version, n_scenarios=20000, seed=42):
+        prices = load_panel(file_paths)
+        returns = prices.pct_change().iloc[1:]
+        self.version = version
+        self.assets = list(returns.columns)
+        self.returns = returns.to_numpy()
+        self.mean = np.nanmean(self.returns, axis=0)
+        self.cov = sample_covariance(self.returns)
+
+        # 历史模拟使用的收益矩阵，缺失值按 0 处理
+        self.filled_returns = np.nan_to_num(self.returns)
+
+        # 各资产相对基准的 beta = cov(r_i, r_m) / var(r_m)
+        m = self.assets.index(benchmark)
+        self.betas = self.cov[:, m] / self.cov[m, m]
+
+        # 协方差分解按数据版本缓存，相关正态情景只在加载时生成一次
+        self.factors = FactorizationCache(max_entries=1)
+        self.factors.put(version, self.cov)
+        L = self.factors.cholesky(version)
+        z = np.random.default_rng(seed).standard_normal((n_scenarios, len(self.assets)))
+        self.scenarios = self.mean + z @ L.T
+
+    def weight_vector(self, weights):
+        # 支持 {资产: 权重} 或与资产列表等长的数组，未列出的资产权重为 0
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(self.assets)
+            if unknown:
+                raise ValueError(f"未知资产: {', '.join(sorted(unknown))}")
+            w = np.array([float(weights.get(asset, 0.0)) for asset in self.assets])
+        else:
+            w = np.asarray(weights, dtype=float)
+        if w.shape != (len(self.assets),):
+            raise ValueError(f"权重长度应为 {len(self.assets)}")
+        if not np.isfinite(w).all():
+            raise ValueError("权重必须为有限数值")
+        return w
+
+    def risk_report(self, weights, confidence_level=0.95, risk_free_rate=0.02, portfolio_value=1000000,
+                    periods_per_year=252):
+        w = self.weight_vector(weights)
+        z = norm.ppf(confidence_level)
+
+        mu_p = w @ self.mean
+        cov_w = self.cov @ w
+        sigma_p = np.sqrt(w @ cov_w)
+        beta_p = w @ self.betas
+        # 组合波动率或 beta 为 0 时 Sharpe、成分VaR 或 Treynor 无定义
+        if not sigma_p > 0:
+            raise ValueError("组合方差为 0，无法计算 Sharpe 与成分VaR")
+        if beta_p == 0:
+            raise ValueError("组合 beta 为 0，无法计算 Treynor 比率")
+        ann_return = mu_p * periods_per_year
+
+        # 参数法VaR及其按欧拉分解的成分VaR (各成分之和等于组合VaR)
+        marginal = z * cov_w / sigma_p - self.mean
+        component = w * marginal * portfolio_value
+        var_parametric = (z * sigma_p - mu_p) * portfolio_value
+
+        alpha = (1 - confidence_level) * 100
+        var_historical = -np.percentile(self.filled_returns @ w, alpha) * portfolio_value
+        var_monte_carlo = -np.percentile(self.scenarios @ w, alpha) * portfolio_value
+
+        return {
+            'version': self.version,
+            'assets': self.assets,
+            'weights': w.tolist(),
+            'annual_return': ann_return,
+            'annual_volatility': sigma_p * np.sqrt(periods_per_year),
+            'sharpe': (ann_return - risk_free_rate) / (sigma_p * np.sqrt(periods_per_year)),
+            'beta': beta_p,
+            'treynor': (ann_return - risk_free_rate) / beta_p,
+            'var_parametric': var_parametric,
+            'var_historical': var_historical,
+            'var_monte_carlo': var_monte_carlo,
+            'component_var': dict(zip(self.assets, component.tolist())),
+            'marginal_var': dict(zip(self.assets, marginal.tolist())),
+        }
+
+
+class RiskService:
+    """
+    持有当前 RiskSnapshot，并在数据文件修改后重建。
+    修改时间最多每 check_interval 秒检查一次；只有取得锁的一个线程负责重建，
+    其他线程不等待，直接使用当前快照。重建失败 (如CSV格式错误) 时保留上一个可用快照，
+    错误记录在 last_error 中，同一版本的文件不再重复重建，直到文件再次修改。
+    """
+
+    def __init__(self, file_paths=None, benchmark='SPY', check_interval=1.0, **snapshot_options):
+        self.file_paths = dict(DEFAULT_FILES if file_paths is None else file_paths)
+        self.benchmark = benchmark
+        self.check_interval = check_interval
+        self.snapshot_options = snapshot_options
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._snapshot = None
+        self._failed_version = None
+        self.last_error = None
+        self.snapshot()
+
+    def _data_version(self):
+        return tuple(os.stat(path).st_mtime_ns for path in self.file_paths.values())
+
+    def snapshot(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < self.check_interval:
+            return self._snapshot
+        # 首次加载必须等待；之后若其他线程正在重建，直接返回当前快照
+        if not self._lock.acquire(blocking=self._snapshot is None):
+            return self._snapshot
+        try:
+            self._last_check = now
+            version = None
+            try:
+                version = self._data_version()
+                if self._snapshot is not None and version == self._snapshot.version:
+                    self.last_error = None
+                elif self._snapshot is None or version != self._failed_version:
+                    self._snapshot = RiskSnapshot(self.file_paths, self.benchmark, version, **self.snapshot_options)
+                    self.last_error = None
+            except Exception as exc:
+                if self._snapshot is None:
+                    raise
+                self._failed_version = version
+                self.last_error = f'{type(exc).__name__}: {exc}'
+        finally:
+            self._lock.release()
+        return self._snapshot
+
+    def risk_report(self, weights, **options):
+        return self.snapshot().risk_report(weights, **options)
+
+
+def _to_json(payload):
+    # numpy 标量与元组转换为 JSON 可序列化对象；NaN/inf 不是合法的 JSON，出现时抛出 ValueError
+    def default(obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError(f"无法序列化的类型: {type(obj)}")
+    return json.dumps(payload, default=default, ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+
+class RiskHTTPServer:
+    """
+    基于 asyncio 的最小 HTTP/1.1 服务: 事件循环只负责收发，风险计算提交到线程池。
+    """
+
+    def __init__(self, service, host='127.0.0.1', port=8765, max_workers=8):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def handle(self, method, path, body):
+        # 在线程池中执行，返回 (状态码, 响应对象)；只有请求参数的错误返回 400，其余异常由调用方记为 500
+        if method == 'GET' and path == '/health':
+            snapshot = self.service.snapshot()
+            error = self.service.last_error
+            return 200, {'status': 'ok' if error is None else 'stale', 'version': snapshot.version,
+                         'n_assets': len(snapshot.assets), 'reload_error': error}
+        if method == 'GET' and path == '/assets':
+            return 200, {'assets': self.service.snapshot().assets}
+        if method == 'POST' and path == '/risk':
+            snapshot = self.service.snapshot()
+            start = time.perf_counter()
+            try:
+                request = json.loads(body or b'{}')
+                if not isinstance(request, dict):
+                    return 400, {'error': '请求体应为 JSON 对象'}
+                weights = request.pop('weights', None)
+                if weights is None:
+                    return 400, {'error': '缺少 weights'}
+                report = snapshot.risk_report(weights, **request)
+            except (ValueError, TypeError) as exc:
+                return 400, {'error': str(exc)}
+            report['elapsed_ms'] = (time.perf_counter() - start) * 1000
+            return 200, report
+        return 404, {'error': f'未知路径: {method} {path}'}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        try:
+            data = _to_json(payload)
+        except (ValueError, TypeError) as exc:
+            status, data = 500, _to_json({'error': f'响应无法序列化: {exc}'})
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+        )
+        await writer.drain()
+
+    async def _serve_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # 请求行或请求头格式错误时返回 400 并关闭连接 (无法确定请求体的边界)
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        key, _, value = line.decode('latin-1').partition(':')
+                        headers[key.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0))
+                    if length < 0:
+                        raise ValueError(f"Content-Length 不能为负: {length}")
+                except ValueError as exc:
+                    await self._respond(writer, 400, {'error': f'请求格式错误: {exc}'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length)
+
+                try:
+                    status, payload = await loop.run_in_executor(self.executor, self.handle, method, path, body)
+                except Exception as exc:
+                    # 请求参数错误已在 handle 内返回 400，这里的异常均为服务端错误，连接保持可用
+                    status, payload = 500, {'error': f'{type(exc).__name__}: {exc}'}
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        print(f"风险服务已启动: http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    service = RiskService()
+    asyncio.run(RiskHTTPServer(service).serve_forever())
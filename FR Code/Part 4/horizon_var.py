@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+多期限VaR与流动性调整VaR
+
+2.2 只计算单一投资金额的一日VaR。这里由模拟的日对数收益 (路径 × 天 [× 组合])
+沿时间做一次累加，同时得到 1、10、20 日及任意期限的VaR，不必对每个期限重新模拟:
+    var           期末损益的分位数 (基于路径)
+    max_loss_var  期限内最差累计损益的分位数 (路径依赖，用 np.minimum.accumulate 一次得到)
+    sqrt_time_var 一日VaR乘以 sqrt(h)，以及它相对路径结果的偏离
+流动性调整使用价格CSV中的 Volume 列: 由日均成交额估计清算天数，并按平方根冲击模型估计清算成本。
+组合很多时，portfolio_horizon_var 按 portfolio_chunk 个组合一批模拟并计算，各批使用同一组情景。
+"""
+
+import numpy as np
+import pandas as pd
+
+from rng_scheduler import run_chunked
+
+
+def simulate_portfolio_returns(mean, cov, weights, n_paths, n_days, seed=None, chunk_size=None, n_workers=1):
+    """
+    资产日对数收益服从多元正态 N(mean, cov)，返回 (n_paths, n_days, n_portfolios) 的组合日对数收益。
+    weights 为 (n_portfolios, n_assets) 或单个权重向量，组合收益按资产收益的加权和近似。
+    改变 chunk_size 会改变抽样结果；并行 (n_workers > 1) 时必须指定 chunk_size。
+    """
+    mean = np.asarray(mean, dtype=float)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    L = np.linalg.cholesky(np.asarray(cov, dtype=float))
+    # 权重与 Cholesky 因子预先相乘: 组合收益 = w'mean + Z (L' w)
+    loadings = L.T @ weights.T
+    drift = weights @ mean
+    out = np.empty((n_paths, n_days, weights.shape[0]))
+
+    def fill_chunk(rng, start, stop):
+        z = rng.standard_normal((stop - start, n_days, L.shape[0]))
+        out[start:stop] = drift + z @ loadings
+
+    run_chunked(fill_chunk, n_paths, chunk_size=chunk_size, seed=seed, n_workers=n_workers)
+    return out
+
+
+def liquidity_profile(close, volume, position_value, participation_rate=0.1, lookback=20, impact_coef=1.0):
+    """
+    由最近 lookback 日的收盘价与成交量估计流动性:
+    日均成交额 adv、按每日最多成交 participation_rate × adv 计算的清算天数，
+    以及平方根冲击成本 impact_coef × sigma × sqrt(position / adv) × position。
+    position_value 可为数组 (多个组合规模)。
+    """
+    close = np.asarray(close, dtype=float)[-(lookback + 1):]
+    volume = np.asarray(volume, dtype=float)[-lookback:]
+    adv = np.mean(close[1:] * volume)
+    sigma = np.std(np.diff(np.log(close)), ddof=1)
+    position_value = np.asarray(position_value, dtype=float)
+
+    liquidation_days = np.maximum(np.ceil(position_value / (participation_rate * adv)), 1).astype(int)
+    impact_cost = impact_coef * sigma * np.sqrt(position_value / adv) * position_value
+    return {'adv': adv, 'liquidation_days': liquidation_days, 'impact_cost': impact_cost}
+
+
+def multi_horizon_var(daily_log_returns, horizons=(1, 10, 20), confidence_level=0.99, portfolio_value=1000000,
+                      liquidation_days=None, liquidity_cost=0.0, portfolio_chunk=100):
+    """
+    daily_log_returns: (n_paths, n_days) 或 (n_paths, n_days, n_portfolios) 的模拟日对数收益。
+    portfolio_value / liquidation_days / liquidity_cost 可为标量或每个组合一个值，
+    与收益序列按广播规则组合 (同一条收益序列可对应多个持仓规模)。
+
+    流动性调整VaR: 期限取 max(h, 清算天数) 的路径VaR，再加上清算成本；
+    模拟天数不足以覆盖清算期时抛出 ValueError。
+    返回以 (portfolio, horizon) 为索引的 DataFrame。
+
+    累计收益按 portfolio_chunk 个收益序列一批计算 (None 为一次全部)，最差累计收益在同一数组上原地求得，
+    输入之外的额外内存约为 8 × n_paths × (n_days + 2 × 期限数) × portfolio_chunk 字节。
+    输入数组本身为 n_paths × n_days × n_portfolios，组合很多时应改用 portfolio_horizon_var 分批模拟。
+    """
+    R = np.asarray(daily_log_returns, dtype=float)
+    if R.ndim == 2:
+        R = R[:, :, None]
+    n_paths, n_days, n_series = R.shape
+    horizons = np.asarray(horizons, dtype=int)
+    # 收益序列与组合规模/流动性参数按广播规则组合，例如同一条收益序列对应多个持仓规模
+    n_portfolios = np.broadcast_shapes((n_series,), np.shape(portfolio_value), np.shape(liquidation_days),
+                                       np.shape(liquidity_cost))
+    n_portfolios = n_portfolios[0] if n_portfolios else 1
+    value = np.broadcast_to(np.asarray(portfolio_value, dtype=float), (n_portfolios,))
+    cost = np.broadcast_to(np.asarray(liquidity_cost, dtype=float), (n_portfolios,))
+
+    if liquidation_days is None:
+        effective = np.broadcast_to(horizons[:, None], (horizons.size, n_portfolios))
+    else:
+        days = np.broadcast_to(np.asarray(liquidation_days, dtype=int), (n_portfolios,))
+        effective = np.maximum(horizons[:, None], days[None, :])
+    needed = np.union1d(np.union1d(horizons, effective.ravel()), [1])
+    if needed.max() > n_days or needed.min() < 1:
+        raise ValueError(f"需要 1 到 {needed.max()} 日的模拟收益，当前只有 {n_days} 日")
+    position = {h: i for i, h in enumerate(needed)}
+
+    alpha = 1 - confidence_level
+    columns = needed - 1
+    end_quantile = np.empty((needed.size, n_series))
+    worst_quantile = np.empty((needed.size, n_series))
+    chunk = n_series if portfolio_chunk is None else portfolio_chunk
+    for lo in range(0, n_series, chunk):
+        hi = min(lo + chunk, n_series)
+        # 一次累加得到所有期限的累计收益，取完期末分位数后原地改写为期限内的最差累计收益
+        cumulative = np.cumsum(R[:, :, lo:hi], axis=1)
+        np.expm1(cumulative, out=cumulative)
+        end_quantile[:, lo:hi] = np.quantile(cumulative[:, columns], alpha, axis=0)
+        np.minimum.accumulate(cumulative, axis=1, out=cumulative)
+        worst_quantile[:, lo:hi] = np.quantile(cumulative[:, columns], alpha, axis=0)
+
+    shape = (needed.size, n_portfolios)
+    end_var = -np.broadcast_to(end_quantile, shape) * value
+    path_var = -np.broadcast_to(worst_quantile, shape) * value
+
+    rows = [position[h] for h in horizons]
+    var = end_var[rows]
+    max_loss_var = path_var[rows]
+    sqrt_time_var = end_var[position[1]] * np.sqrt(horizons)[:, None]
+    effective_rows = np.searchsorted(needed, effective)
+    lvar = np.take_along_axis(end_var, effective_rows, axis=0) + cost
+
+    index = pd.MultiIndex.from_product([range(n_portfolios), horizons], names=['portfolio', 'horizon'])
+    report = pd.DataFrame({
+        'var': var.T.ravel(),
+        'max_loss_var': max_loss_var.T.ravel(),
+        'sqrt_time_var': sqrt_time_var.T.ravel(),
+        'liquidation_horizon': effective.T.ravel(),
+        'liquidity_cost': np.repeat(cost, horizons.size),
+        'lvar': lvar.T.ravel(),
+    }, index=index)
+    # 平方根法则相对路径VaR的偏离比例 (正值表示平方根法则高估)
+    report['sqrt_time_deviation'] = report['sqrt_time_var'] / report['var'] - 1
+    return report
+
+
+def portfolio_horizon_var(mean, cov, weights, n_paths, n_days, horizons=(1, 10, 20), confidence_level=0.99,
+                          portfolio_value=1000000, liquidation_days=None, liquidity_cost=0.0, seed=None,
+                          chunk_size=None, n_workers=1, portfolio_chunk=100):
+    """
+    对成千上万个组合计算多期限VaR，而不分配完整的 (n_paths, n_days, n_portfolios) 数组:
+    每次只模拟 portfolio_chunk 个组合的收益并调用 multi_horizon_var，峰值内存约为
+    8 × n_paths × (2 × n_days + 2 × 期限数) × portfolio_chunk 字节。
+    同一个 seed 下各批的资产收益情景完全相同 (随机数只取决于路径分块)，结果与一次模拟全部组合一致。
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    n_portfolios = weights.shape[0]
+    if seed is None:
+        # 各批必须共用同一组情景，未给定种子时先固定一个随机熵
+        seed = np.random.SeedSequence().entropy
+    params = [None if x is None else np.broadcast_to(np.asarray(x), (n_portfolios,))
+              for x in (portfolio_value, liquidation_days, liquidity_cost)]
+
+    reports = []
+    for lo in range(0, n_portfolios, portfolio_chunk):
+        hi = min(lo + portfolio_chunk, n_portfolios)
+        simulated = simulate_portfolio_returns(mean, cov, weights[lo:hi], n_paths, n_days, seed=seed,
+                                               chunk_size=chunk_size, n_workers=n_workers)
+        value, days, cost = (None if x is None else x[lo:hi] for x in params)
+        report = multi_horizon_var(simulated, horizons=horizons, confidence_level=confidence_level,
+                                   portfolio_value=value, liquidation_days=days, liquidity_cost=cost,
+                                   portfolio_chunk=None)
+        report.index = report.index.set_levels(report.index.levels[0] + lo, level='portfolio')
+        reports.append(report)
+    return pd.concat(reports)
+
+
+if __name__ == "__main__":
+    from path_engines import calibrate_merton, simulate_merton_paths
+
+    # 读取AAPL价格与成交量 (与4.1相同的数据清理方式)
+    data = pd.read_csv('4.1 AAPL_data.csv')
+    data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
+    data['Volume'] = pd.to_numeric(data['Volume'], errors='coerce')
+    data_clean = data.dropna(subset=['Close', 'Volume'])
+    log_returns = np.diff(np.log(data_clean['Close'].values))
+
+    # 单一资产: 用校准后的 Merton 跳跃扩散模拟60日路径，一次得到全部期限
+    n_days = 60
+    paths = simulate_merton_paths(data_clean['Close'].values[-1], T=n_days / 252, n_steps=n_days, n_paths=100000,
+                                  seed=42, chunk_size=25000, **calibrate_merton(log_returns))
+    daily = np.diff(np.log(paths), axis=1)
+
+    # 三种持仓规模，流动性由 Volume 列估计
+    positions = np.array([1e6, 5e9, 5e10])
+    liquidity = liquidity_profile(data_clean['Close'], data_clean['Volume'], positions)
+    print(f"AAPL 日均成交额: {liquidity['adv'] / 1e9:.2f} 十亿美元, 清算天数: {liquidity['liquidation_days']}")
+
+    report = multi_horizon_var(daily, horizons=(1, 10, 20), confidence_level=0.99,
+                               portfolio_value=positions, liquidation_days=liquidity['liquidation_days'],
+                               liquidity_cost=liquidity['impact_cost'])
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_columns', None)
+    print(report.round(4))
+
+    # 多组合: 1000个随机权重组合共用同一组情景，每批100个组合模拟并计算，内存不随组合数增长
+    rng = np.random.default_rng(7)
+    n_assets = 5
+    A = rng.normal(0, 0.01, (n_assets, n_assets))
+    weights = rng.dirichlet(np.ones(n_assets), 1000)
+    many = portfolio_horizon_var(np.full(n_assets, 0.0003), A @ A.T + np.eye(n_assets) * 1e-4, weights,
+                                 n_paths=10000, n_days=20, horizons=(1, 5, 10, 20), seed=2023, chunk_size=2500,
+                                 portfolio_chunk=100)
+    print(f"\n1000个组合的平方根法则平均偏离:\n{many.groupby(level='horizon')['sqrt_time_deviation'].mean().round(4)}")
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+二叉树/三叉树期权定价 (CRR、Jarrow-Rudd、三叉树)，支持美式提前行权
+
+2.4 中的二项分布是 CRR 二叉树的基础: n 步后上涨 j 次的概率即 binom.pmf(j, n, p)。
+这里对一批合约 (标的价格、行权价、期限、利率、波动率可各不相同) 同时做逆向递推:
+每个合约只保留一列长度为 n+1 (三叉树为 2n+1) 的价值数组并原地更新，
+时间方向逐步循环，同一步内的所有合约与节点均为向量化运算。
+
+二叉树价格随步数奇偶振荡，直接对 P(n)、P(2n) 做 Richardson 外推可能放大误差；
+因此外推使用 BBS 平滑 (最后一步以一期 Black-Scholes 价格代替到期收益)，平滑后误差单调收敛。
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+METHODS = ('crr', 'jarrow-rudd', 'trinomial')
+
+
+def _tree_parameters(dt, r, q, sigma, method):
+    # 返回 (log_up, log_down, p_up, p_mid, p_down)，二叉树的 p_mid 为 0
+    if method == 'crr':
+        log_up = sigma * np.sqrt(dt)
+        log_down = -log_up
+        p_up = (np.exp((r - q) * dt) - np.exp(log_down)) / (np.exp(log_up) - np.exp(log_down))
+        return log_up, log_down, p_up, 0.0, 1 - p_up
+    if method == 'jarrow-rudd':
+        drift = (r - q - 0.5 * sigma ** 2) * dt
+        return drift + sigma * np.sqrt(dt), drift - sigma * np.sqrt(dt), 0.5, 0.0, 0.5
+    if method == 'trinomial':
+        # Boyle 三叉树: 上下跳幅 sigma * sqrt(2 dt)，中间节点不变
+        half = sigma * np.sqrt(dt / 2)
+        growth = np.exp((r - q) * dt / 2)
+        p_up = ((growth - np.exp(-half)) / (np.exp(half) - np.exp(-half))) ** 2
+        p_down = ((np.exp(half) - growth) / (np.exp(half) - np.exp(-half))) ** 2
+        return 2 * half, -2 * half, p_up, 1 - p_up - p_down, p_down
+    raise ValueError(f"未知的树方法: {method} (可选 {', '.join(METHODS)})")
+
+
+def _one_period_black_scholes(S, K, dt, r, q, sigma, sign):
+    # 剩余期限为 dt 的欧式期权 Black-Scholes 价格，sign 为 +1 (看涨) 或 -1 (看跌)
+    vol = sigma * np.sqrt(dt)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma ** 2) * dt) / vol
+    d2 = d1 - vol
+    return sign * (S * np.exp(-q * dt) * norm.cdf(sign * d1) - K * np.exp(-r * dt) * norm.cdf(sign * d2))
+
+
+def _backward_induction(S0, K, T, r, sigma, sign, american, q, n_steps, method, smoothing=False):
+    # 所有输入均为长度 M 的一维数组，返回 M 个合约的价格
+    # smoothing=True 时从第 n-1 步开始递推，节点价值取一期 Black-Scholes 价格 (美式再与行权价值取大)
+    dt = T / n_steps
+    log_up, log_down, p_up, p_mid, p_down = (np.broadcast_to(x, S0.shape) for x in
+                                             _tree_parameters(dt, r, q, sigma, method))
+    invalid = (p_up < 0) | (p_up > 1) | (p_mid < 0) | (p_down < 0) | (p_down > 1)
+    if invalid.any():
+        raise ValueError(f"{int(invalid.sum())} 个合约的风险中性概率不在 [0, 1] 内 "
+                         f"(步长相对 sigma 过大或利率过高)，请增加 n_steps 或改用 jarrow-rudd")
+    disc = np.exp(-r * dt)
+    a_up, a_mid, a_down = disc * p_up, disc * p_mid, disc * p_down
+    trinomial = method == 'trinomial'
+    any_american = american.any()
+    exercise_weight = None if american.all() else american.astype(float)
+
+    # 数组布局为 (节点, 合约)，每步取前 m 行即为连续内存，内层循环沿合约方向
+    # 到期节点价格按下跌到上涨排列；之后每退一步，节点价格只需整体乘以同一个因子:
+    # 二叉树 S(i, j) = S(i+1, j) / d，三叉树 S(i, j) = S(i+1, j) * u
+    last = n_steps - 1 if smoothing else n_steps
+    if trinomial:
+        j = np.arange(2 * last + 1)[:, None]
+        S = np.exp(np.log(S0) + (j - last) * log_up)
+        step_factor = np.exp(log_up)
+    else:
+        j = np.arange(last + 1)[:, None]
+        S = np.exp(np.log(S0) + last * log_down + j * (log_up - log_down))
+        step_factor = np.exp(-log_down)
+
+    intrinsic = np.maximum(sign * (S - K), 0.0)
+    if smoothing:
+        V = _one_period_black_scholes(S, K, dt, r, q, sigma, sign)
+        if any_american:
+            V = np.maximum(V, intrinsic * american)
+    else:
+        V = intrinsic
+    buffer = np.empty_like(V)
+    for i in range(last - 1, -1, -1):
+        m = 2 * i + 1 if trinomial else i + 1
+        head = V[:m]
+        up = buffer[:m]
+        if trinomial:
+            np.multiply(V[2:m + 2], a_up, out=up)
+            up += a_mid * V[1:m + 1]
+        else:
+            np.multiply(V[1:m + 1], a_up, out=up)
+        head *= a_down
+        head += up
+
+        if any_american:
+            nodes = S[:m]
+            nodes *= step_factor
+            # 提前行权: 复用 buffer 计算行权价值，欧式合约的权重为 0 (价值非负，不受影响)
+            exercise = buffer[:m]
+            np.subtract(nodes, K, out=exercise)
+            exercise *= sign
+            if exercise_weight is not None:
+                exercise *= exercise_weight
+            np.maximum(head, exercise, out=head)
+    return V[0]
+
+
+def price_lattice(S0, K, T, r, sigma, option_type='put', american=True, n_steps=200, method='crr',
+                  dividend_yield=0.0, richardson=False):
+    """
+    批量树定价。S0/K/T/r/sigma/option_type/american 可为标量或数组，按广播规则组合成一批合约，
+    返回与广播后形状相同的价格数组。T = 0 的合约返回内在价值。
+    richardson=True 时对 BBS 平滑后的价格做外推 2 * P(2n) - P(n) (需要额外一次 2n 步递推)。
+    风险中性概率超出 [0, 1] (步数过少、sigma 很低而利率很高) 时抛出 ValueError。
+    """
+    if method not in METHODS:
+        raise ValueError(f"未知的树方法: {method} (可选 {', '.join(METHODS)})")
+    option_type = np.asarray(option_type)
+    if not np.isin(option_type, ['call', 'put']).all():
+        raise ValueError("option_type 只能为 'call' 或 'put'")
+
+    arrays = np.broadcast_arrays(np.asarray(S0, dtype=float), np.asarray(K, dtype=float),
+                                 np.asarray(T, dtype=float), np.asarray(r, dtype=float),
+                                 np.asarray(sigma, dtype=float), np.where(option_type == 'call', 1.0, -1.0),
+                                 np.asarray(american, dtype=bool), np.asarray(dividend_yield, dtype=float))
+    shape = arrays[0].shape
+    S0, K, T, r, sigma, sign, american, q = (np.ravel(a) for a in arrays)
+    if (T < 0).any():
+        raise ValueError("期限 T 不能为负")
+
+    # 已到期的合约直接取内在价值，只对剩余合约递推
+    price = np.maximum(sign * (S0 - K), 0.0)
+    live = T > 0
+    if live.any():
+        args = [a[live] for a in (S0, K, T, r, sigma, sign, american, q)]
+        live_price = _backward_induction(*args, n_steps, method, smoothing=richardson)
+        if richardson:
+            live_price = 2 * _backward_induction(*args, 2 * n_steps, method, smoothing=True) - live_price
+        price[live] = live_price
+    return price.reshape(shape)
+
+
+def price_grid(S0, strikes, maturities, r, sigma, option_type='put', american=True, **options):
+    # 对行权价 × 期限网格一次性定价，返回以期限为行、行权价为列的 DataFrame
+    T, K = np.meshgrid(np.asarray(maturities, dtype=float), np.asarray(strikes, dtype=float), indexing='ij')
+    prices = price_lattice(S0, K, T, r, sigma, option_type=option_type, american=american, **options)
+    return pd.DataFrame(prices, index=pd.Index(maturities, name='T'), columns=pd.Index(strikes, name='K'))
+
+
+if __name__ == "__main__":
+    import time
+
+    from mc_pricer import black_scholes
+
+    S0, r, sigma = 100.0, 0.05, 0.2
+
+    # 欧式期权与 Black-Scholes 解析解对照
+    print("欧式看跌 (K=100, T=1) 与 Black-Scholes 对照:")
+    bs = float(black_scholes(S0, 100.0, 1.0, r, sigma, option_type='put')['price'])
+    for method in ('crr', 'jarrow-rudd', 'trinomial'):
+        plain = float(price_lattice(S0, 100.0, 1.0, r, sigma, american=False, method=method))
+        extrapolated = float(price_lattice(S0, 100.0, 1.0, r, sigma, american=False, method=method, richardson=True))
+        print(f"{method:>12}: {plain:.5f}  Richardson: {extrapolated:.5f}  BS: {bs:.5f}")
+
+    # 美式看跌 (Longstaff-Schwartz 文献算例: S0=36, K=40, r=6%, sigma=20%, T=1，参考值约 4.487)
+    american_put = float(price_lattice(36.0, 40.0, 1.0, 0.06, 0.2, n_steps=1000, method='crr', richardson=True))
+    print(f"\n美式看跌 S0=36, K=40: {american_put:.4f}")
+
+    # 行权价 × 期限网格批量定价
+    strikes = np.arange(80, 121, 5)
+    maturities = [0.25, 0.5, 1.0, 2.0]
+    print("\n美式看跌价格网格:")
+    print(price_grid(S0, strikes, maturities, r, sigma).round(4))
+
+    # 5万个合约一次批量重估
+    rng = np.random.default_rng(0)
+    n_contracts = 50000
+    start = time.perf_counter()
+    price_lattice(S0, rng.uniform(70, 130, n_contracts), rng.uniform(0.1, 2.0, n_contracts), r, sigma,
+                  option_type=np.where(rng.random(n_contracts) < 0.5, 'call', 'put'), n_steps=100)
+    print(f"\n{n_contracts} 个美式合约 (100步) 重估耗时: {time.perf_counter() - start:.2f} 秒")
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+向量化路径模拟引擎
+
+所有引擎返回统一的路径数组: 形状为 (n_paths, n_steps + 1)，第 0 列为初始价格，
+时间网格为等距的 T / n_steps。路径按 chunk_size 分块生成，避免一次性分配
+n_paths × n_steps 的正态随机数矩阵；每块的随机数流由 rng_scheduler 从 seed 派生，
+各块可在 n_workers 个线程上并行写入同一个输出数组，结果与线程数无关，但与 chunk_size 有关。
+n_workers > 1 时必须指定 chunk_size。
+"""
+
+import numpy as np
+from scipy import stats
+from scipy.optimize import least_squares
+
+from rng_scheduler import run_chunked
+
+
+def time_grid(T, n_steps):
+    # 与路径数组列对应的时间点 t_0 = 0, ..., t_n = T
+    return np.linspace(0.0, T, n_steps + 1)
+
+
+def simulate_gbm_paths(S0, mu, sigma, T, n_steps, n_paths, seed=None, chunk_size=None, n_workers=1):
+    """
+    几何布朗运动: S_{t+dt} = S_t * exp[(mu - sigma^2/2) dt + sigma sqrt(dt) Z]
+
+    期权定价时 mu 应取无风险利率 r (风险中性测度)。
+    随机数按 chunk_size 分块派生，改变 chunk_size 会改变抽样结果 (改变 n_workers 不会)。
+    """
+    dt = T / n_steps
+    drift = (mu - 0.5 * sigma ** 2) * dt
+    vol = sigma * np.sqrt(dt)
+
+    paths = np.empty((n_paths, n_steps + 1))
+    paths[:, 0] = S0
+
+    def fill_chunk(rng, start, stop):
+        log_increments = drift + vol * rng.standard_normal((stop - start, n_steps))
+        # 对数收益累加后一次性取指数，避免逐步相乘的 Python 循环
+        np.cumsum(log_increments, axis=1, out=log_increments)
+        paths[start:stop, 1:] = S0 * np.exp(log_increments)
+
+    run_chunked(fill_chunk, n_paths, chunk_size=chunk_size, seed=seed, n_workers=n_workers)
+    return paths
+
+
+def simulate_merton_paths(S0, mu, sigma, jump_intensity, jump_mean, jump_std, T, n_steps, n_paths,
+                          seed=None, chunk_size=None, n_workers=1):
+    """
+    Merton 跳跃扩散: 在GBM基础上叠加强度为 jump_intensity 的泊松跳跃，
+    跳跃幅度 log(J) ~ N(jump_mean, jump_std^2)，漂移经补偿后 E[S_T] = S0 * exp(mu T)。
+    随机数按 chunk_size 分块派生，改变 chunk_size 会改变抽样结果 (改变 n_workers 不会)。
+    """
+    dt = T / n_steps
+    k = np.exp(jump_mean + 0.5 * jump_std ** 2) - 1
+    drift = (mu - jump_intensity * k - 0.5 * sigma ** 2) * dt
+    vol = sigma * np.sqrt(dt)
+
+    paths = np.empty((n_paths, n_steps + 1))
+    paths[:, 0] = S0
+
+    def fill_chunk(rng, start, stop):
+        shape = (stop - start, n_steps)
+        log_increments = drift + vol * rng.standard_normal(shape)
+        # 每步的跳跃次数批量抽取，N 个正态跳跃之和 ~ N(N*m, N*s^2)
+        n_jumps = rng.poisson(jump_intensity * dt, shape)
+        log_increments += n_jumps * jump_mean + np.sqrt(n_jumps) * jump_std * rng.standard_normal(shape)
+        np.cumsum(log_increments, axis=1, out=log_increments)
+        paths[start:stop, 1:] = S0 * np.exp(log_increments)
+
+    run_chunked(fill_chunk, n_paths, chunk_size=chunk_size, seed=seed, n_workers=n_workers)
+    return paths
+
+
+def simulate_heston_paths(S0, mu, v0, kappa, theta, xi, rho, T, n_steps, n_paths,
+                          seed=None, chunk_size=None, n_workers=1, return_variance=False):
+    """
+    Heston 随机波动率，采用完全截断 (full truncation) Euler 格式:
+    漂移与扩散项中的方差均取 max(v, 0)，保证离散方差为负时不产生虚数波动率。
+    return_variance=True 时同时返回相同形状的方差路径。
+    随机数按 chunk_size 分块派生，改变 chunk_size 会改变抽样结果 (改变 n_workers 不会)。
+    """
+    dt = T / n_steps
+    sqrt_dt = np.sqrt(dt)
+    rho_bar = np.sqrt(1 - rho ** 2)
+
+    paths = np.empty((n_paths, n_steps + 1))
+    variances = np.empty((n_paths, n_steps + 1)) if return_variance else None
+
+    def fill_chunk(rng, start, stop):
+        size = stop - start
+        log_s = np.full(size, np.log(S0))
+        v = np.full(size, float(v0))
+        paths[start:stop, 0] = S0
+        if return_variance:
+            variances[start:stop, 0] = v0
+        # 时间方向的递推无法消除，但每一步都对整块路径做向量化计算
+        for i in range(1, n_steps + 1):
+            z_v = rng.standard_normal(size)
+            z_s = rho * z_v + rho_bar * rng.standard_normal(size)
+            v_pos = np.maximum(v, 0.0)
+            sqrt_v = np.sqrt(v_pos)
+            log_s += (mu - 0.5 * v_pos) * dt + sqrt_v * sqrt_dt * z_s
+            v += kappa * (theta - v_pos) * dt + xi * sqrt_v * sqrt_dt * z_v
+            paths[start:stop, i] = np.exp(log_s)
+            if return_variance:
+                variances[start:stop, i] = np.maximum(v, 0.0)
+
+    run_chunked(fill_chunk, n_paths, chunk_size=chunk_size, seed=seed, n_workers=n_workers)
+    if return_variance:
+        return paths, variances
+    return paths
+
+
+def calibrate_gbm(returns, dt=1 / 252):
+    # 由对数收益率的前两阶矩估计年化 mu 与 sigma
+    returns = np.asarray(returns, dtype=float)
+    sigma = returns.std(ddof=1) / np.sqrt(dt)
+    mu = returns.mean() / dt + 0.5 * sigma ** 2
+    return {'mu': mu, 'sigma': sigma}
+
+
+def calibrate_merton(returns, dt=1 / 252, jump_intensity=None, threshold=3.0):
+    """
+    矩估计: 用对数收益率的均值、方差、三阶与四阶累积量匹配 Merton 模型。
+    jump_intensity 未给定时，以偏离均值超过 threshold 倍标准差的收益频率估计年化跳跃强度。
+    样本无超额峰度时退化为GBM (跳跃强度为0)。
+    """
+    returns = np.asarray(returns, dtype=float)
+    n = returns.shape[0]
+    c1, c2 = returns.mean(), returns.var(ddof=1)
+    c3 = stats.skew(returns) * c2 ** 1.5
+    c4 = stats.kurtosis(returns) * c2 ** 2
+
+    if jump_intensity is None:
+        jump_intensity = np.sum(np.abs(returns - c1) > threshold * np.sqrt(c2)) / (n * dt)
+    if jump_intensity <= 0 or c4 <= 0:
+        return {**calibrate_gbm(returns, dt), 'jump_intensity': 0.0, 'jump_mean': 0.0, 'jump_std': 0.0}
+
+    lam_dt = jump_intensity * dt
+
+    def residuals(params):
+        # 以偏度和超额峰度的量纲匹配，避免日收益累积量数值过小导致优化器提前停止
+        m, s = params
+        return [(lam_dt * (m ** 3 + 3 * m * s ** 2) - c3) / c2 ** 1.5,
+                (lam_dt * (m ** 4 + 6 * m ** 2 * s ** 2 + 3 * s ** 4) - c4) / c2 ** 2]
+
+    # 初值取对称跳跃 (m=0) 时的四阶累积量解
+    s_init = (c4 / (3 * lam_dt)) ** 0.25
+    fit = least_squares(residuals, x0=[0.0, s_init], bounds=([-np.inf, 0.0], [np.inf, np.inf]),
+                        x_scale=[s_init, s_init])
+    jump_mean, jump_std = fit.x
+
+    # 扩散部分方差为剩余方差，截断为非负
+    sigma2 = max(c2 / dt - jump_intensity * (jump_mean ** 2 + jump_std ** 2), 0.0)
+    k = np.exp(jump_mean + 0.5 * jump_std ** 2) - 1
+    mu = (c1 - lam_dt * jump_mean) / dt + jump_intensity * k + 0.5 * sigma2
+    return {'mu': mu, 'sigma': np.sqrt(sigma2), 'jump_intensity': jump_intensity,
+            'jump_mean': jump_mean, 'jump_std': jump_std}
+
+
+def calibrate_heston(returns, dt=1 / 252, window=21):
+    """
+    由历史收益率粗略估计 Heston 参数:
+    以 window 日滚动实现方差作为方差代理，对其做 AR(1) 回归得到 kappa 和 xi，
+    theta 为样本年化方差，v0 取最新的实现方差。
+    rho 由当日收益 r_t 与其前后各 window 日实现方差之差 (RV(t+1..t+window) - RV(t-window..t-1))
+    的协方差估计，方差代理不含 r_t 本身，避免把收益的偏度误当作杠杆效应；
+    再按 xi、theta 和均值回复的衰减换算为相关系数。
+    """
+    returns = np.asarray(returns, dtype=float)
+    squared = (returns - returns.mean()) ** 2
+    # 累积和实现滚动平均，避免逐窗口循环
+    csum = np.concatenate(([0.0], np.cumsum(squared)))
+    v = (csum[window:] - csum[:-window]) / window / dt
+
+    v_prev, v_next = v[:-1], v[1:]
+    phi, intercept = np.polyfit(v_prev, v_next, 1)
+    phi = min(max(phi, 1e-6), 1 - 1e-6)
+    kappa = -np.log(phi) / dt
+    theta = returns.var(ddof=1) / dt
+    resid = v_next - (intercept + phi * v_prev)
+    xi = resid.std(ddof=1) / np.sqrt(v_prev.mean() * dt)
+
+    # t 日的方差冲击 xi * sqrt(v) dW_v 在随后 window 日平均方差中按均值回复衰减，平均权重为 decay
+    t = np.arange(window, returns.shape[0] - window)
+    tau = window * dt
+    dv = (csum[t + 1 + window] - csum[t + 1] - (csum[t] - csum[t - window])) / tau
+    x = returns[t]
+    cov = np.mean((x - x.mean()) * (dv - dv.mean()))
+    decay = (1 - np.exp(-kappa * tau)) / (kappa * tau)
+    rho = float(np.clip(cov / (xi * theta * dt * decay), -1.0, 1.0))
+    mu = returns.mean() / dt + 0.5 * theta
+    return {'mu': mu, 'v0': v[-1], 'kappa': kappa, 'theta': theta, 'xi': xi, 'rho': rho}
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    # 读取AAPL收盘价并计算对数收益率
+    data = pd.read_csv('4.1 AAPL_data.csv')
+    prices = pd.to_numeric(data['Close'], errors='coerce').dropna().values
+    log_returns = np.diff(np.log(prices))
+
+    n_paths, n_steps, T = 100000, 10, 10 / 252
+    S0 = prices[-1]
+    gbm = simulate_gbm_paths(S0, T=T, n_steps=n_steps, n_paths=n_paths, seed=42, chunk_size=20000,
+                             **calibrate_gbm(log_returns))
+    merton = simulate_merton_paths(S0, T=T, n_steps=n_steps, n_paths=n_paths, seed=42, chunk_size=20000,
+                                   **calibrate_merton(log_returns))
+    heston = simulate_heston_paths(S0, T=T, n_steps=n_steps, n_paths=n_paths, seed=42, chunk_size=20000,
+                                   **calibrate_heston(log_returns))
+
+    # 比较10日99% VaR 与终值收益的峰度
+    print(f"历史日收益峰度 (Pearson): {stats.kurtosis(log_returns, fisher=False):.2f}")
+    for name, paths in [('GBM', gbm), ('Merton', merton), ('Heston', heston)]:
+        horizon_returns = np.log(paths[:, -1] / S0)
+        var_99 = -np.percentile(horizon_returns, 1)
+        print(f"{name}: 10日99% VaR = {var_99:.2%}, 峰度 = {stats.kurtosis(horizon_returns, fisher=False):.2f}")